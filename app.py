@@ -4,19 +4,25 @@ Receives text from Mistral Custom Agent, generates DOCX files, and provides down
 """
 
 from flask import Flask, request, jsonify, send_from_directory
-from docx import Document
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.exceptions import NotFound
+from urllib.parse import quote
 import os
-import uuid
+import re
+import hmac
 import threading
 import time
-from datetime import datetime
-from pathlib import Path
 import logging
 from dotenv import load_dotenv
-import shutil
 
 # Import docx_logic functions
-from docx_logic import generate_docx_from_text, archive_files_after_delay
+from docx_logic import generate_docx_from_text, schedule_archives as _schedule_archives
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
 
 # Configure logging
 logging.basicConfig(
@@ -28,46 +34,92 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider using orjson for request parsing and jsonify."""
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_SORT_KEYS if self.sort_keys else 0
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+if HAS_ORJSON:
+    app.json = OrjsonProvider(app)
 
 # Configuration
-UPLOAD_FOLDER = '/app/docx_files'
-ARCHIVE_FOLDER = '/app/archive'
+UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "/app/docx_files")
+ARCHIVE_FOLDER = os.getenv("ARCHIVE_FOLDER", "/app/archive")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(ARCHIVE_FOLDER, exist_ok=True)
 
+# Names accepted by /download: generated DOCX files only
+_DOWNLOAD_FILENAME_RE = re.compile(r'[\w-][\w.-]*\.docx')
+
+# Maximum number of documents per /generate_docx_bulk request
+BULK_MAX_DOCUMENTS = int(os.getenv("BULK_MAX_DOCUMENTS", "50"))
+
 # API Key for authentication
 API_KEY = os.getenv("DOCKER_API_KEY", "YOUR_API_KEY")
+_EXPECTED_AUTH = f"Bearer {API_KEY}".encode()
 DOCKER_IP = os.getenv("DOCKER_IP", "http://localhost:5000")
 
 # Public URL for download links (used by external clients like Mistral)
 PUBLIC_URL = os.getenv("PUBLIC_URL", DOCKER_IP)
+DOWNLOAD_URL_PREFIX = f"{PUBLIC_URL}/download/"
 
 # Optional: Template path for advanced DOCX formatting
 TEMPLATE_PATH = os.getenv("TEMPLATE_PATH", "/app/templates/bhk-base.docx")
 
+# Optional: Nginx internal location serving UPLOAD_FOLDER (e.g. "/internal_docx/").
+# When set, downloads are handed to Nginx via X-Accel-Redirect instead of
+# being streamed through Python.
+X_ACCEL_REDIRECT_PREFIX = os.getenv("X_ACCEL_REDIRECT_PREFIX", "")
+
+
+def schedule_archive(docx_filename, txt_filename, delay=86400):
+    """Schedule archival of a generated DOCX and its source TXT after `delay` seconds."""
+    schedule_archives([(docx_filename, txt_filename)], delay)
+
+
+def schedule_archives(file_pairs, delay=86400):
+    """Schedule archival of several (docx_filename, txt_filename) pairs in one batch."""
+    _schedule_archives(file_pairs, UPLOAD_FOLDER, ARCHIVE_FOLDER, delay)
+
+
+def _expiry_iso(delay):
+    """Return local time `delay` seconds from now as ISO 8601 (seconds precision)."""
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(time.time() + delay))
+
 
 def verify_api_key(request):
     """Verify API key from request headers."""
     auth_header = request.headers.get('Authorization', '')
-    expected_auth = f"Bearer {API_KEY}"
 
-    if auth_header != expected_auth:
+    # Constant-time comparison against the precomputed header value
+    if not hmac.compare_digest(auth_header.encode(), _EXPECTED_AUTH):
         logger.warning(f"Unauthorized access attempt: {auth_header}")
         return False
     return True
 
 
+# The health payload is constant, so it is serialized once
+_HEALTH_JSON = app.json.dumps({
+    "status": "healthy",
+    "service": "docx-generator",
+    "version": "1.0.0",
+    "upload_folder": UPLOAD_FOLDER,
+    "archive_folder": ARCHIVE_FOLDER
+})
+
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
-    return jsonify({
-        "status": "healthy",
-        "service": "docx-generator",
-        "version": "1.0.0",
-        "upload_folder": UPLOAD_FOLDER,
-        "archive_folder": ARCHIVE_FOLDER
-    }), 200
+    return app.response_class(_HEALTH_JSON, mimetype='application/json'), 200
 
 
 @app.route('/generate_docx', methods=['POST'])
@@ -82,6 +134,9 @@ def generate_docx():
         "format_mode": "bhk" or "plain" (optional, default: "bhk")
     }
 
+    Large dictations can also be posted as a raw ``text/plain`` body, with
+    ``filename`` and ``format_mode`` passed as query parameters.
+
     Returns:
     {
         "download_url": "http://[PUBLIC_URL]/download/[filename]",
@@ -95,11 +150,16 @@ def generate_docx():
         return jsonify({"error": "Unauthorized"}), 401
 
     # Validate request
-    if not request.json:
-        return jsonify({"error": "No JSON payload provided"}), 400
+    if request.mimetype == 'text/plain':
+        # Raw text body; options are passed as query parameters
+        text = request.get_data(cache=False, as_text=True)
+        data = request.args
+    else:
+        data = request.get_json(cache=False, silent=True)
+        if not data or not isinstance(data, dict):
+            return jsonify({"error": "No JSON payload provided"}), 400
+        text = data.get('text', '')
 
-    data = request.json
-    text = data.get('text', '')
     custom_filename = data.get('filename', None)
     format_mode = data.get('format_mode', 'bhk')  # Default to BHK format
 
@@ -125,24 +185,20 @@ def generate_docx():
         logger.info(f"Generated DOCX: {filename} (format: {format_mode})")
 
         # Generate download URL using PUBLIC_URL (for external access via subdomain)
-        download_url = f"{PUBLIC_URL}/download/{filename}"
+        download_url = DOWNLOAD_URL_PREFIX + filename
 
         # Calculate expiry time (24 hours)
-        expires_at = datetime.now().timestamp() + 86400
+        expires_at = _expiry_iso(86400)
 
         # Schedule file deletion and archival after 24 hours
-        threading.Thread(
-            target=archive_files_after_delay,
-            args=(filename, txt_filename, 86400),
-            daemon=True
-        ).start()
+        schedule_archive(filename, txt_filename, 86400)
 
         return jsonify({
             "download_url": download_url,
             "filename": filename,
             "source_filename": txt_filename,
             "format_mode": format_mode,
-            "expires_at": datetime.fromtimestamp(expires_at).isoformat(),
+            "expires_at": expires_at,
             "message": f"DOCX generated successfully in {format_mode.upper()} format. Files will be archived after 24 hours."
         }), 200
 
@@ -154,6 +210,96 @@ def generate_docx():
         }), 500
 
 
+@app.route('/generate_docx_bulk', methods=['POST'])
+def generate_docx_bulk():
+    """
+    Generate several DOCX files in one request.
+
+    Expected JSON payload (list of documents, same fields as /generate_docx):
+    [
+        {"text": "...", "filename": "optional_custom_name", "format_mode": "bhk"},
+        ...
+    ]
+
+    Returns:
+    {
+        "documents": [
+            {"download_url": "...", "filename": "...", "source_filename": "...", "format_mode": "..."},
+            ...
+        ],
+        "expires_at": "timestamp"
+    }
+    """
+    # Authentication
+    if not verify_api_key(request):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    # Validate request
+    items = request.get_json(cache=False, silent=True)
+    if not items or not isinstance(items, list):
+        return jsonify({"error": "Expected a JSON list of documents"}), 400
+
+    if len(items) > BULK_MAX_DOCUMENTS:
+        return jsonify({"error": f"Too many documents. Maximum is {BULK_MAX_DOCUMENTS}"}), 400
+
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get('text'):
+            return jsonify({"error": f"No text provided for document {index}"}), 400
+        if not isinstance(item['text'], str):
+            return jsonify({"error": f"Text of document {index} must be a string"}), 400
+        if not isinstance(item.get('filename'), (str, type(None))):
+            return jsonify({"error": f"Filename of document {index} must be a string"}), 400
+        if item.get('format_mode', 'bhk') not in ['bhk', 'plain']:
+            return jsonify({"error": f"Invalid format_mode for document {index}. Must be 'bhk' or 'plain'"}), 400
+
+    try:
+        documents = []
+        generated = []
+        used_filenames = set()
+
+        for item in items:
+            format_mode = item.get('format_mode', 'bhk')
+
+            filename, txt_filename = generate_docx_from_text(
+                text=item['text'],
+                output_folder=UPLOAD_FOLDER,
+                template_path=TEMPLATE_PATH,
+                custom_filename=item.get('filename', None),
+                use_bhk_format=(format_mode == 'bhk'),
+                used_filenames=used_filenames
+            )
+            generated.append((filename, txt_filename))
+
+            documents.append({
+                "download_url": DOWNLOAD_URL_PREFIX + filename,
+                "filename": filename,
+                "source_filename": txt_filename,
+                "format_mode": format_mode
+            })
+
+        logger.info(f"Generated {len(documents)} DOCX files in bulk")
+
+        # Calculate expiry time (24 hours)
+        expires_at = _expiry_iso(86400)
+
+        # Schedule archival of the whole batch after 24 hours
+        schedule_archives(generated, 86400)
+
+        return jsonify({
+            "documents": documents,
+            "expires_at": expires_at
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error generating DOCX batch: {str(e)}", exc_info=True)
+        # Documents generated before the failure still get archived
+        schedule_archives(generated, 86400)
+        return jsonify({
+            "error": "Failed to generate DOCX",
+            "details": str(e)
+        }), 500
+
+
 @app.route('/download/<filename>')
 def download_file(filename):
     """
@@ -163,11 +309,30 @@ def download_file(filename):
         filename: Name of the file to download
 
     Returns:
-        File download or 404 if not found
+        File download, 400 for invalid filenames or 404 if not found
     """
-    file_path = os.path.join(UPLOAD_FOLDER, filename)
+    # Only plain generated filenames, no paths or other file types
+    if not _DOWNLOAD_FILENAME_RE.fullmatch(filename):
+        logger.warning(f"Invalid download filename: {filename}")
+        return jsonify({"error": "Invalid filename"}), 400
 
-    if not os.path.exists(file_path):
+    try:
+        if X_ACCEL_REDIRECT_PREFIX:
+            if not os.path.isfile(os.path.join(UPLOAD_FOLDER, filename)):
+                raise NotFound()
+
+            # Nginx sends the file itself (sendfile), Flask only sets the headers
+            response = app.response_class(
+                mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+            )
+            quoted = quote(filename)
+            response.headers['Content-Disposition'] = f"attachment; filename*=UTF-8''{quoted}"
+            response.headers['X-Accel-Redirect'] = f"{X_ACCEL_REDIRECT_PREFIX}{quoted}"
+        else:
+            # send_from_directory stats the file itself and raises NotFound
+            response = send_from_directory(UPLOAD_FOLDER, filename, as_attachment=True)
+
+    except NotFound:
         logger.warning(f"File not found: {filename}")
         return jsonify({
             "error": "File not found",
@@ -175,32 +340,92 @@ def download_file(filename):
         }), 404
 
     logger.info(f"Downloading file: {filename}")
-    return send_from_directory(UPLOAD_FOLDER, filename, as_attachment=True)
+    return response
+
 
+# Admin listings cached per name as (directory mtimes, data)
+_listing_cache = {}
+_listing_lock = threading.Lock()
 
-# archive_files_after_delay is now imported from docx_logic
-# Kept here for backward compatibility with old function signature
-def archive_files_after_delay(docx_filename, txt_filename, delay):
+
+def _cached_listing(name, dirs, build):
     """
-    Backward compatibility wrapper for archive_files_after_delay.
-    Calls the function from docx_logic with correct parameters.
-    
+    Return build(), reusing the previous result while `dirs` are unchanged.
+
+    A directory's mtime changes whenever an entry is added or removed, so the
+    mtimes of all scanned directories identify the listing. Results are not
+    cached while a directory changed within the last second, because a second
+    change inside the same mtime tick would go unnoticed.
+
     Args:
-        docx_filename: Name of the DOCX file
-        txt_filename: Name of the source TXT file
-        delay: Delay in seconds (default: 86400 = 24 hours)
+        name: Cache slot name
+        dirs: Directories the listing is built from
+        build: Callable producing the listing
+
+    Returns:
+        The (possibly cached) listing
     """
-    # Import and call the function from docx_logic
-    from docx_logic import archive_files_after_delay as archive_func
-    archive_func(
-        docx_filename=docx_filename,
-        txt_filename=txt_filename,
-        upload_folder=UPLOAD_FOLDER,
-        archive_folder=ARCHIVE_FOLDER,
-        delay=delay
+    key = tuple(os.stat(d).st_mtime_ns for d in dirs)
+
+    with _listing_lock:
+        cached = _listing_cache.get(name)
+    if cached and cached[0] == key:
+        return cached[1]
+
+    data = build()
+
+    if time.time_ns() - max(key) > 1_000_000_000:
+        with _listing_lock:
+            _listing_cache[name] = (key, data)
+    return data
+
+
+def _archive_date_dirs():
+    """Return the paths of the date subfolders in ARCHIVE_FOLDER."""
+    with os.scandir(ARCHIVE_FOLDER) as it:
+        return [entry.path for entry in it if entry.is_dir(follow_symlinks=False)]
+
+
+def _build_archive_listing():
+    """Build the {date_folder: {"count", "files"}} archive listing."""
+    archives = {}
+
+    with os.scandir(ARCHIVE_FOLDER) as it:
+        for entry in it:
+            # Directory entries carry their type, so no extra stat() per folder
+            if entry.is_dir(follow_symlinks=False):
+                with os.scandir(entry.path) as files_it:
+                    files = [f.name for f in files_it]
+                archives[entry.name] = {
+                    "count": len(files),
+                    "files": files
+                }
+
+    return archives
+
+
+def _get_archive_listing():
+    """Return the archive listing, rescanning only when a folder changed."""
+    return _cached_listing(
+        "archives", [ARCHIVE_FOLDER, *_archive_date_dirs()], _build_archive_listing
     )
 
 
+def _build_active_counts():
+    """Count the active DOCX/TXT files in UPLOAD_FOLDER in a single scan."""
+    docx_count = txt_count = total = 0
+
+    with os.scandir(UPLOAD_FOLDER) as it:
+        for entry in it:
+            total += 1
+            if entry.name.endswith('.docx'):
+                docx_count += 1
+            elif entry.name.endswith('.txt'):
+                txt_count += 1
+
+    return {"docx": docx_count, "txt": txt_count, "total": total}
+
+
 @app.route('/list_archives', methods=['GET'])
 def list_archives():
     """
@@ -215,20 +440,10 @@ def list_archives():
         return jsonify({"error": "Unauthorized"}), 401
 
     try:
-        archives = {}
-
         if not os.path.exists(ARCHIVE_FOLDER):
             return jsonify({"archives": {}}), 200
 
-        for date_folder in os.listdir(ARCHIVE_FOLDER):
-            date_path = os.path.join(ARCHIVE_FOLDER, date_folder)
-
-            if os.path.isdir(date_path):
-                files = os.listdir(date_path)
-                archives[date_folder] = {
-                    "count": len(files),
-                    "files": files
-                }
+        archives = _get_archive_listing()
 
         return jsonify({"archives": archives}), 200
 
@@ -251,23 +466,17 @@ def get_stats():
         return jsonify({"error": "Unauthorized"}), 401
 
     try:
-        active_files = os.listdir(UPLOAD_FOLDER) if os.path.exists(UPLOAD_FOLDER) else []
-        active_docx = [f for f in active_files if f.endswith('.docx')]
-        active_txt = [f for f in active_files if f.endswith('.txt')]
+        if os.path.exists(UPLOAD_FOLDER):
+            active_files = _cached_listing("active", [UPLOAD_FOLDER], _build_active_counts)
+        else:
+            active_files = {"docx": 0, "txt": 0, "total": 0}
 
         archive_count = 0
         if os.path.exists(ARCHIVE_FOLDER):
-            for date_folder in os.listdir(ARCHIVE_FOLDER):
-                date_path = os.path.join(ARCHIVE_FOLDER, date_folder)
-                if os.path.isdir(date_path):
-                    archive_count += len(os.listdir(date_path))
+            archive_count = sum(entry["count"] for entry in _get_archive_listing().values())
 
         return jsonify({
-            "active_files": {
-                "docx": len(active_docx),
-                "txt": len(active_txt),
-                "total": len(active_files)
-            },
+            "active_files": active_files,
             "archived_files": archive_count,
             "upload_folder": UPLOAD_FOLDER,
             "archive_folder": ARCHIVE_FOLDER
@@ -7,16 +7,269 @@ import logging
 import re
 from typing import Optional, Dict, Any, List
 from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+from docx.enum.text import WD_UNDERLINE
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
 from docx.shared import Pt, Inches
 
 logger = logging.getLogger(__name__)
 
+try:
+    import markdown_it_pyrs
+    HAS_MARKDOWN_IT_PYRS = True
+except ImportError:
+    HAS_MARKDOWN_IT_PYRS = False
+
 try:
     import mistune
     HAS_MISTUNE = True
 except ImportError:
     HAS_MISTUNE = False
-    logger.warning("mistune not installed - BHK formatting will be limited")
+    if not HAS_MARKDOWN_IT_PYRS:
+        logger.warning("mistune not installed - BHK formatting will be limited")
+
+# Line tokenizer for the simple fallback converter: one alternative per line
+# kind, tried in order - heading (#, ##, ...), bullet (-, *, +), numbered
+# (1., 2., ...), anything else. [^\S\n] is \s without crossing into the next line.
+_LINE_RE = re.compile(
+    r'^(?:(?P<heading>#{1,6})[^\S\n]+(?P<heading_text>.+)'
+    r'|[^\S\n]*[-*+][^\S\n]+(?P<bullet_text>.+)'
+    r'|[^\S\n]*(?P<number>\d+)\.[^\S\n]+(?P<numbered_text>.+)'
+    r'|(?P<line>.+))$',
+    re.MULTILINE,
+)
+
+# Horizontal rules, skipped by the fallback converter
+_SEPARATORS = frozenset(('---', '***', '___'))
+
+# Inline pattern: **bold** or __bold__ (groups 1-2), *italic* or _italic_ (groups 3-4)
+_INLINE_RE = re.compile(r'\*\*(.+?)\*\*|__(.+?)__|\*(.+?)\*|_(.+?)_')
+
+# markdown-it-pyrs node names whose mistune AST type differs
+_PYRS_TYPE_NAMES = {
+    'autolink': 'link',
+    'em': 'emphasis',
+    'hardbreak': 'linebreak',
+    'hr': 'thematic_break',
+    'blockquote': 'block_quote',
+    'lheading': 'heading',
+    'text_special': 'text',
+}
+
+# markdown-it-pyrs block nodes (everything else inside a list item is inline)
+_PYRS_BLOCK_NAMES = frozenset((
+    'heading', 'lheading', 'paragraph', 'bullet_list', 'ordered_list',
+    'hr', 'fence', 'code_block', 'blockquote', 'html_block',
+))
+
+
+def _pyrs_to_ast(nodes, depth: int = 0) -> List[Dict[str, Any]]:
+    """Translate markdown-it-pyrs nodes into mistune's AST dict schema.
+
+    Lets the Rust parser feed the existing mistune-based node processing.
+
+    Args:
+        nodes: markdown-it-pyrs nodes
+        depth: List nesting depth of the nodes
+
+    Returns:
+        List of AST nodes as produced by mistune's AST renderer
+    """
+    ast = []
+    plain = None  # last text node that following plain text joins, as in mistune
+
+    for node in nodes:
+        name = node.name
+        meta = node.meta
+
+        if name in ('text', 'text_special'):
+            info = meta.get('info')
+            # mistune's AST keeps character references (&amp;, &copy;) as written
+            # and merges them into the surrounding text; escapes stay separate
+            raw = meta.get('markup', '') if info == 'entity' else meta.get('content', '')
+            if plain is not None and info != 'escape':
+                plain['raw'] += raw
+            else:
+                ast.append({'type': 'text', 'raw': raw})
+                plain = ast[-1] if info != 'escape' else None
+            continue
+
+        plain = None
+        if name == 'fence':
+            ast.append({'type': 'block_code', 'raw': meta.get('content', '')})
+        elif name == 'code_block':
+            # mistune drops the final newline of indented code blocks
+            ast.append({'type': 'block_code', 'raw': meta.get('content', '').rstrip('\n')})
+        elif name == 'code_inline':
+            raw = ''.join(child.meta.get('content', '') for child in node.children)
+            ast.append({'type': 'codespan', 'raw': raw})
+        elif name == 'html_block':
+            ast.append({'type': 'block_html', 'raw': meta.get('content', '')})
+        elif name == 'html_inline':
+            ast.append({'type': 'inline_html', 'raw': meta.get('content', '')})
+        elif name in ('bullet_list', 'ordered_list'):
+            ast.append({
+                'type': 'list',
+                'attrs': {'ordered': name == 'ordered_list', 'depth': depth},
+                'children': [_pyrs_list_item(item, depth) for item in node.children],
+            })
+        else:
+            entry = {'type': _PYRS_TYPE_NAMES.get(name, name)}
+            if 'level' in meta:
+                entry['attrs'] = {'level': meta['level']}
+            elif 'url' in meta:
+                entry['attrs'] = {'url': meta['url']}
+            if node.children:
+                entry['children'] = _pyrs_to_ast(node.children, depth)
+            ast.append(entry)
+
+    return ast
+
+
+def _pyrs_list_item(item, depth: int) -> Dict[str, Any]:
+    """Translate a markdown-it-pyrs list item into a mistune list_item node.
+
+    Tight list items hold their inline nodes directly; mistune wraps those in
+    a 'block_text' node, which is reproduced here.
+    """
+    children = []
+    inline = []
+
+    for child in item.children:
+        if child.name in _PYRS_BLOCK_NAMES:
+            if inline:
+                children.append({'type': 'block_text', 'children': _pyrs_to_ast(inline, depth)})
+                inline = []
+            children.extend(_pyrs_to_ast([child], depth + 1))
+        else:
+            inline.append(child)
+
+    if inline:
+        children.append({'type': 'block_text', 'children': _pyrs_to_ast(inline, depth)})
+
+    return {'type': 'list_item', 'children': children}
+
+
+def _add_run(para, text: str):
+    """Append a run to a paragraph element, like Paragraph.add_run.
+
+    Args:
+        para: Paragraph element (w:p)
+        text: Run text; tabs and line breaks become w:tab/w:br
+
+    Returns:
+        The new run element (w:r)
+    """
+    run = para.add_r()
+    if text:
+        run.text = text
+    return run
+
+
+def _set_font_name(run, name: str) -> None:
+    """Set the font of a run element, like Run.font.name."""
+    rPr = run.get_or_add_rPr()
+    rPr.rFonts_ascii = name
+    rPr.rFonts_hAnsi = name
+
+
+def _extract_text(children: List[Dict[str, Any]]) -> str:
+    """Extract plain text from AST nodes.
+
+    Args:
+        children: List of AST nodes
+
+    Returns:
+        Plain text string
+    """
+    # Explicit stack instead of recursion: deeply nested lists would
+    # otherwise cost one Python frame per level
+    text_parts = []
+    stack = list(reversed(children))
+
+    while stack:
+        child = stack.pop()
+        if isinstance(child, str):
+            text_parts.append(child)
+        elif child.get('type') == 'text':
+            text_parts.append(child.get('raw', ''))
+        elif 'children' in child:
+            stack.extend(reversed(child['children']))
+        elif 'raw' in child:
+            text_parts.append(child['raw'])
+
+    return ''.join(text_parts)
+
+
+# Inline node handlers, called as handler(para, node) with a w:p element
+
+def _inline_text(para, node: Dict[str, Any]) -> None:
+    """Plain text."""
+    _add_run(para, node.get('raw', ''))
+
+
+def _inline_strong(para, node: Dict[str, Any]) -> None:
+    """**bold**"""
+    run = _add_run(para, _extract_text(node.get('children', [])))
+    run.get_or_add_rPr().get_or_add_b()
+
+
+def _inline_emphasis(para, node: Dict[str, Any]) -> None:
+    """_italic_"""
+    run = _add_run(para, _extract_text(node.get('children', [])))
+    run.get_or_add_rPr().get_or_add_i()
+
+
+def _inline_codespan(para, node: Dict[str, Any]) -> None:
+    """`code`"""
+    run = _add_run(para, node.get('raw', ''))
+    _set_font_name(run, 'Courier New')
+
+
+def _inline_link(para, node: Dict[str, Any]) -> None:
+    """[text](url)"""
+    link_text = _extract_text(node.get('children', []))
+    url = node.get('attrs', {}).get('url', '')
+    run = _add_run(para, f'{link_text} ({url})')
+    run.get_or_add_rPr().u_val = WD_UNDERLINE.SINGLE
+
+
+def _inline_linebreak(para, node: Dict[str, Any]) -> None:
+    """Line break."""
+    _add_run(para, '\n')
+
+
+def _inline_other(para, node: Dict[str, Any]) -> None:
+    """Unknown inline type - extract text."""
+    text = _extract_text([node])
+    if text:
+        _add_run(para, text)
+
+
+_INLINE_HANDLERS = {
+    'text': _inline_text,
+    'strong': _inline_strong,
+    'emphasis': _inline_emphasis,
+    'codespan': _inline_codespan,
+    'link': _inline_link,
+    'linebreak': _inline_linebreak,
+}
+
+
+def _create_markdown_parser():
+    """Create the Markdown-to-AST parser, preferring the Rust backend.
+
+    Returns:
+        Callable mapping Markdown text to mistune-style AST nodes,
+        or None if no Markdown parser is installed
+    """
+    if HAS_MARKDOWN_IT_PYRS:
+        md = markdown_it_pyrs.MarkdownIt('commonmark')
+        return lambda text: _pyrs_to_ast(md.tree(text).children)
+    if HAS_MISTUNE:
+        return mistune.create_markdown(renderer='ast')
+    return None
 
 
 class BHKFormatter:
@@ -30,6 +283,10 @@ class BHKFormatter:
     - Inline formatting preserved (**bold**, _italic_)
     """
     
+    # Shared by all instances: building the parser sets up its rule tables,
+    # which costs more than parsing a short dictation. Parsing is reentrant.
+    _MD = staticmethod(_create_markdown_parser())
+    
     def __init__(self, template_path: Optional[str] = None):
         """Initialize BHK Formatter.
         
@@ -37,6 +294,12 @@ class BHKFormatter:
             template_path: Path to BHK template DOCX (must contain BHK_Standard style)
         """
         self.template_path = template_path
+        # Per-document state, set up by _bind on the first paragraph
+        self._part = None
+        self._body = None
+        self._sectPr = None
+        self._style_obj = None
+        self._style_id = None
         
     def convert_to_docx(self, doc: Document, markdown_text: str) -> None:
         """Convert Markdown text to BHK-formatted DOCX.
@@ -45,16 +308,15 @@ class BHKFormatter:
             doc: Document object to populate
             markdown_text: Markdown-formatted text
         """
-        if not HAS_MISTUNE:
+        if self._MD is None:
             # Fallback: Simple line-based conversion
-            logger.warning("Using fallback converter (mistune not available)")
+            logger.warning("Using fallback converter (no Markdown parser available)")
             self._convert_simple(doc, markdown_text)
             return
             
         try:
             # Parse Markdown to AST
-            md = mistune.create_markdown(renderer='ast')
-            ast = md(markdown_text)
+            ast = self._MD(markdown_text)
             
             # Process AST nodes
             self._process_nodes(doc, ast)
@@ -105,21 +367,20 @@ class BHKFormatter:
         logger.debug(f"Processing H{level} as BHK_Standard (bold)")
         
         # Create paragraph
-        para = doc.add_paragraph()
+        para = self._add_paragraph(doc)
         
         # Apply formatted text (preserves existing bold/underline)
         self._apply_inline_formatting(para, children)
         
         # Make entire heading bold to distinguish from regular paragraphs
-        for run in para.runs:
-            if not run.bold:
-                run.bold = True
+        for run in para.r_lst:
+            run.get_or_add_rPr().get_or_add_b().val = True
         
         # Apply BHK_Standard style
         self._apply_bhk_style(para)
         
         # Optional: Add spacing after headings
-        para.paragraph_format.space_after = Pt(6)
+        para.get_or_add_pPr().spacing_after = Pt(6)
     
     def _process_list(self, doc: Document, node: Dict[str, Any], depth: int = 0) -> None:
         """Process list as BHK_Standard paragraphs with bullet markers.
@@ -142,13 +403,13 @@ class BHKFormatter:
             item_children = item.get('children', [])
             
             # Create paragraph
-            para = doc.add_paragraph()
+            para = self._add_paragraph(doc)
             
             # Add bullet marker or number
             if is_ordered:
-                para.add_run(f'{idx}. ')
+                _add_run(para, f'{idx}. ')
             else:
-                para.add_run('• ')
+                _add_run(para, '• ')
             
             # Process item content (may contain nested lists)
             for child in item_children:
@@ -167,7 +428,7 @@ class BHKFormatter:
             
             # Set indentation for nested items
             if depth > 0:
-                para.paragraph_format.left_indent = Inches(0.25 * depth)
+                para.get_or_add_pPr().ind_left = Inches(0.25 * depth)
     
     def _process_paragraph(self, doc: Document, node: Dict[str, Any]) -> None:
         """Process standard paragraph as BHK_Standard.
@@ -178,13 +439,22 @@ class BHKFormatter:
         """
         children = node.get('children', [])
         
+        # Fast path for the common plain-text paragraph: one walk, one run
+        if len(children) == 1 and children[0].get('type') == 'text':
+            raw_text = children[0].get('raw', '')
+            if raw_text.strip():
+                para = self._add_paragraph(doc)
+                _add_run(para, raw_text)
+                self._apply_bhk_style(para)
+            return
+        
         # Skip empty paragraphs
-        text_content = self._extract_text(children)
+        text_content = _extract_text(children)
         if not text_content.strip():
             return
         
         # Create paragraph
-        para = doc.add_paragraph()
+        para = self._add_paragraph(doc)
         
         # Apply formatted text
         self._apply_inline_formatting(para, children)
@@ -201,86 +471,60 @@ class BHKFormatter:
         """
         raw_code = node.get('raw', '')
         
-        para = doc.add_paragraph(raw_code)
+        para = self._add_paragraph(doc)
         self._apply_bhk_style(para)
         
         # Optional: Use monospace font for code
-        for run in para.runs:
-            run.font.name = 'Courier New'
+        if raw_code:
+            _set_font_name(_add_run(para, raw_code), 'Courier New')
     
     def _apply_inline_formatting(self, para, children: List[Dict[str, Any]]) -> None:
         """Apply inline formatting (bold, italic, text) to paragraph.
         
         Args:
-            para: Paragraph object
+            para: Paragraph element (w:p)
             children: List of inline nodes (text, strong, emphasis, etc.)
         """
         for child in children:
-            child_type = child.get('type', '')
-            
-            if child_type == 'text':
-                # Plain text
-                raw_text = child.get('raw', '')
-                para.add_run(raw_text)
-                
-            elif child_type == 'strong':
-                # **bold**
-                text = self._extract_text(child.get('children', []))
-                run = para.add_run(text)
-                run.bold = True
-                
-            elif child_type == 'emphasis':
-                # _italic_
-                text = self._extract_text(child.get('children', []))
-                run = para.add_run(text)
-                run.italic = True
-                
-            elif child_type == 'codespan':
-                # `code`
-                code_text = child.get('raw', '')
-                run = para.add_run(code_text)
-                run.font.name = 'Courier New'
-                
-            elif child_type == 'link':
-                # [text](url)
-                link_text = self._extract_text(child.get('children', []))
-                url = child.get('attrs', {}).get('url', '')
-                run = para.add_run(f'{link_text} ({url})')
-                run.font.underline = True
-                
-            elif child_type == 'linebreak':
-                # Line break
-                para.add_run('\n')
-                
-            else:
-                # Unknown inline type - extract text
-                text = self._extract_text([child])
-                if text:
-                    para.add_run(text)
+            _INLINE_HANDLERS.get(child.get('type', ''), _inline_other)(para, child)
+    
+    def _bind(self, doc: Document) -> None:
+        """Set up per-document state for building paragraphs.
+        
+        Paragraphs are built as XML elements and inserted in front of the
+        final w:sectPr, which is located once here; doc.add_paragraph would
+        search for it and wrap every paragraph and run in Python objects.
+        Resolving a style by name scans the styles part, so that is also done
+        once per document instead of once per paragraph.
+        
+        Args:
+            doc: Document object
+        """
+        self._part = doc.part
+        self._body = doc.element.body
+        self._sectPr = self._body.find(qn('w:sectPr'))
+        self._style_obj = self._resolve_bhk_style(doc.styles)
+        if self._style_obj is not None:
+            self._style_id = doc.part.get_style_id(self._style_obj, WD_STYLE_TYPE.PARAGRAPH)
     
-    def _extract_text(self, children: List[Dict[str, Any]]) -> str:
-        """Extract plain text from AST nodes.
+    def _add_paragraph(self, doc: Document):
+        """Append an empty paragraph to the document body.
         
         Args:
-            children: List of AST nodes
+            doc: Document object
             
         Returns:
-            Plain text string
+            The new paragraph element (w:p)
         """
-        text_parts = []
-        
-        for child in children:
-            if isinstance(child, str):
-                text_parts.append(child)
-            elif child.get('type') == 'text':
-                text_parts.append(child.get('raw', ''))
-            elif 'children' in child:
-                # Recursive extraction
-                text_parts.append(self._extract_text(child['children']))
-            elif 'raw' in child:
-                text_parts.append(child['raw'])
-                
-        return ''.join(text_parts)
+        if self._part is not doc.part:
+            self._bind(doc)
+        
+        para = OxmlElement('w:p')
+        if self._sectPr is not None:
+            self._sectPr.addprevious(para)
+        else:
+            self._body.append(para)
+        return para
     
     def _apply_bhk_style(self, para) -> None:
         """Apply BHK_Standard style to paragraph.
@@ -288,19 +532,33 @@ class BHKFormatter:
         Falls back to Normal if BHK_Standard not available.
         
         Args:
-            para: Paragraph object
+            para: Paragraph element (w:p) created by _add_paragraph
+        """
+        if self._style_obj is not None:
+            para.style = self._style_id
+    
+    def _resolve_bhk_style(self, styles):
+        """Look up BHK_Standard, falling back to Normal.
+        
+        Args:
+            styles: Styles collection of the document
+            
+        Returns:
+            Style object, or None if neither style exists
         """
         try:
             # Try to apply BHK_Standard style
-            para.style = 'BHK_Standard'
+            style = styles['BHK_Standard']
             logger.debug("Applied BHK_Standard style")
+            return style
         except KeyError:
             # Fallback: Use Normal style
             logger.warning("BHK_Standard style not found in template, using Normal")
             try:
-                para.style = 'Normal'
+                return styles['Normal']
             except KeyError:
                 logger.warning("Normal style also not found, using default")
+                return None
     
     def _convert_simple(self, doc: Document, text: str) -> None:
         """Fallback: Simple line-based conversion without full Markdown parsing.
@@ -311,67 +569,43 @@ class BHKFormatter:
             doc: Document object
             text: Plain or Markdown text
         """
-        lines = text.split('\n')
-        i = 0
-        
-        while i < len(lines):
-            line = lines[i]
-            
-            # Skip separator lines
-            if line.strip() in ['---', '***', '___']:
-                i += 1
-                continue
+        for match in _LINE_RE.finditer(text):
+            kind = match.lastgroup
             
             # Detect headings (###, ##, #)
-            heading_match = re.match(r'^(#{1,6})\s+(.+)$', line)
-            if heading_match:
-                level = len(heading_match.group(1))
-                heading_text = heading_match.group(2)
-                
-                para = doc.add_paragraph()
-                self._apply_simple_inline_formatting(para, heading_text)
+            if kind == 'heading_text':
+                para = self._add_paragraph(doc)
+                self._apply_simple_inline_formatting(para, match.group('heading_text'))
                 
                 # Make bold
-                for run in para.runs:
-                    run.bold = True
+                for run in para.r_lst:
+                    run.get_or_add_rPr().get_or_add_b().val = True
                 
                 self._apply_bhk_style(para)
-                para.paragraph_format.space_after = Pt(6)
-                i += 1
-                continue
+                para.get_or_add_pPr().spacing_after = Pt(6)
             
             # Detect list items (-, *, +)
-            list_match = re.match(r'^[\s]*[-*+]\s+(.+)$', line)
-            if list_match:
-                list_text = list_match.group(1)
-                
-                para = doc.add_paragraph()
-                para.add_run('• ')
-                self._apply_simple_inline_formatting(para, list_text)
+            elif kind == 'bullet_text':
+                para = self._add_paragraph(doc)
+                _add_run(para, '• ')
+                self._apply_simple_inline_formatting(para, match.group('bullet_text'))
                 self._apply_bhk_style(para)
-                i += 1
-                continue
             
             # Detect numbered lists (1., 2., etc.)
-            numbered_match = re.match(r'^[\s]*(\d+)\.\s+(.+)$', line)
-            if numbered_match:
-                number = numbered_match.group(1)
-                list_text = numbered_match.group(2)
-                
-                para = doc.add_paragraph()
-                para.add_run(f'{number}. ')
-                self._apply_simple_inline_formatting(para, list_text)
-                self._apply_bhk_style(para)
-                i += 1
-                continue
-            
-            # Regular paragraph
-            if line.strip():
-                para = doc.add_paragraph()
-                self._apply_simple_inline_formatting(para, line)
+            elif kind == 'numbered_text':
+                para = self._add_paragraph(doc)
+                _add_run(para, f"{match.group('number')}. ")
+                self._apply_simple_inline_formatting(para, match.group('numbered_text'))
                 self._apply_bhk_style(para)
             
-            i += 1
+            # Regular paragraph, skipping blank and separator lines
+            else:
+                line = match.group('line')
+                stripped = line.strip()
+                if stripped and stripped not in _SEPARATORS:
+                    para = self._add_paragraph(doc)
+                    self._apply_simple_inline_formatting(para, line)
+                    self._apply_bhk_style(para)
     
     def _apply_simple_inline_formatting(self, para, text: str) -> None:
         """Apply simple inline formatting using regex.
@@ -379,54 +613,33 @@ class BHKFormatter:
         Supports **bold** and _italic_.
         
         Args:
-            para: Paragraph object
+            para: Paragraph element (w:p)
             text: Text with Markdown inline formatting
         """
-        # Simple regex-based processing
-        # Pattern: **bold** or __bold__
-        bold_pattern = r'\*\*(.+?)\*\*|__(.+?)__'
-        # Pattern: *italic* or _italic_
-        italic_pattern = r'\*(.+?)\*|_(.+?)_'
-        
-        # For simplicity, process in order and handle text/bold/italic
-        # This is a simplified version - full implementation would be more complex
+        # Most dictated lines carry no markup at all; skip the regex scan
+        if '*' not in text and '_' not in text:
+            if text:
+                _add_run(para, text)
+            return
         
-        remaining = text
+        # Single left-to-right scan; bold alternatives come first so that
+        # **text** is not taken as *italic* with stray asterisks
+        pos = 0
         
-        while remaining:
-            # Check for bold
-            bold_match = re.search(bold_pattern, remaining)
-            italic_match = re.search(italic_pattern, remaining)
-            
-            # Find first match
-            first_match = None
-            match_type = None
+        for match in _INLINE_RE.finditer(text):
+            # Add text before match
+            if match.start() > pos:
+                _add_run(para, text[pos:match.start()])
             
-            if bold_match and (not italic_match or bold_match.start() < italic_match.start()):
-                first_match = bold_match
-                match_type = 'bold'
-            elif italic_match:
-                first_match = italic_match
-                match_type = 'italic'
-            
-            if first_match:
-                # Add text before match
-                before_text = remaining[:first_match.start()]
-                if before_text:
-                    para.add_run(before_text)
-                
-                # Add formatted text
-                formatted_text = first_match.group(1) or first_match.group(2)
-                run = para.add_run(formatted_text)
-                
-                if match_type == 'bold':
-                    run.bold = True
-                elif match_type == 'italic':
-                    run.italic = True
-                
-                # Continue with remaining text
-                remaining = remaining[first_match.end():]
+            # Groups 1-2 are bold, 3-4 italic
+            run = _add_run(para, match.group(match.lastindex))
+            if match.lastindex <= 2:
+                run.get_or_add_rPr().get_or_add_b()
             else:
-                # No more formatting - add remaining text
-                para.add_run(remaining)
-                break
+                run.get_or_add_rPr().get_or_add_i()
+            
+            pos = match.end()
+        
+        # No more formatting - add remaining text
+        if pos < len(text):
+            _add_run(para, text[pos:])
@@ -1,11 +1,24 @@
 import os
-import uuid
+import copy
+import errno
+import functools
+import heapq
+import re
 import threading
 import time
 import shutil
+import io
 import logging
+import multiprocessing
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
 
 # Import BHK formatter
 try:
@@ -18,7 +31,66 @@ except ImportError:
 # Configure logging
 logger = logging.getLogger(__name__)
 
-def generate_docx_from_text(text, output_folder, template_path=None, custom_filename=None, use_bhk_format=True):
+# _save_docx writes the package itself using python-docx internals (the private
+# content types item, Part.before_marshal, rels.xml); if a python-docx release
+# drops them, documents are saved with Document.save instead
+try:
+    from docx.opc.packuri import CONTENT_TYPES_URI, PACKAGE_URI
+    from docx.opc.part import Part
+    from docx.opc.pkgwriter import _ContentTypesItem
+    from docx.opc.rel import Relationships
+    HAS_FAST_SAVE = hasattr(Part, 'before_marshal') and hasattr(Relationships, 'xml')
+except ImportError:
+    HAS_FAST_SAVE = False
+if not HAS_FAST_SAVE:
+    logger.warning("python-docx package internals not available - saving with Document.save")
+
+# Source texts are written on a small thread pool so requests don't wait on
+# disk IO; unfinished writes are tracked as {path: Future}. Pool threads are
+# joined at interpreter exit, so queued writes still reach disk.
+_WRITE_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="text-writer")
+_pending_writes = {}
+_pending_lock = threading.Lock()
+
+# A paragraph: consecutive non-empty lines, i.e. the text between blank lines
+_PARAGRAPH_RE = re.compile(r'[^\n]+(?:\n(?!\n)[^\n]+)*')
+
+# First non-whitespace character (\s matches exactly what str.strip removes)
+_NON_SPACE_RE = re.compile(r'\S')
+
+# Filename sanitizing: Markdown symbols dropped from titles, and anything but
+# letters, digits, spaces, hyphens and underscores (\w matches str.isalnum + '_')
+_MARKDOWN_SYMBOLS = str.maketrans('', '', '#*_`>-|[]()')
+_FILENAME_UNSAFE_RE = re.compile(r'[^\w -]+')
+
+# Pending archivals as a min-heap of (due, docx_filename, txt_filename,
+# upload_folder, archive_folder) on the monotonic clock, served by a single
+# background thread started on first use. Due moves run on a small pool so a
+# slow cross-filesystem copy doesn't hold up the others.
+_ARCHIVE_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="archive")
+_archive_heap = []
+_archive_cv = threading.Condition()
+_archive_thread = None
+
+# Deflate level for generated DOCX files (0 = stored, 1 = fastest, 9 = smallest).
+# Files only live for 24 hours, so save speed matters more than size.
+DOCX_COMPRESS_LEVEL = int(os.getenv("DOCX_COMPRESS_LEVEL", "1"))
+
+# Worker processes for building documents (0 = build in the calling thread).
+# Gunicorn already runs one worker process per core; this is meant for
+# single-process deployments such as the MCP server.
+DOCX_BUILD_WORKERS = int(os.getenv("DOCX_BUILD_WORKERS", "0"))
+_build_pool = None
+_build_pool_lock = threading.Lock()
+
+# Serialized package members that never change between documents built from
+# the same template: {template_key: {membername: bytes}}, keeping as many
+# template versions as _load_template does
+_static_members = {}
+_STATIC_MEMBERS_MAX = 4
+
+def generate_docx_from_text(text, output_folder, template_path=None, custom_filename=None, use_bhk_format=True,
+                            used_filenames=None):
     """
     Generate DOCX from text input.
     
@@ -28,43 +100,34 @@ def generate_docx_from_text(text, output_folder, template_path=None, custom_file
         template_path: Path to BHK template (optional)
         custom_filename: Custom filename (optional)
         use_bhk_format: If True, parse Markdown and apply BHK formatting (default: True)
+        used_filenames: Set of DOCX names already generated in the same batch (optional).
+            A clashing name gets a _2, _3, ... suffix; the chosen name is added to the set.
     
     Returns:
         Tuple of (docx_filename, txt_filename)
     """
     try:
         # Generate unique filename with timestamp
-        timestamp = datetime.now().strftime("%y%m%d_%H%M")
+        timestamp = time.strftime("%y%m%d_%H%M")
 
         if custom_filename:
             # Clean custom filename
             custom_filename = custom_filename.replace('.docx', '').replace('.doc', '')
             # Remove special characters
-            custom_filename = ''.join(c for c in custom_filename if c.isalnum() or c in (' ', '-', '_'))
+            custom_filename = _FILENAME_UNSAFE_RE.sub('', custom_filename)
             custom_filename = custom_filename.replace(' ', '_').strip('_')
             filename = f"{timestamp}_{custom_filename}.docx"
         else:
             # Try to extract a meaningful name from the text content
-            lines = text.split('\n')
-            first_line = ''
-            
-            # Find first non-empty line
-            for line in lines:
-                if line.strip():
-                    first_line = line.strip()
-                    break
+            first_line = _first_nonempty_line(text)
             
             # Create filename from first line (max 30 chars)
             if first_line:
-                # Remove ALL common markdown symbols
-                cleaned = first_line
-                # Remove markdown symbols: #, *, _, `, >, -, etc.
-                for symbol in ['#', '*', '_', '`', '>', '-', '|', '[', ']', '(', ')']:
-                    cleaned = cleaned.replace(symbol, '')
-                cleaned = cleaned.strip()
+                # Remove ALL common markdown symbols: #, *, _, `, >, -, etc.
+                cleaned = first_line.translate(_MARKDOWN_SYMBOLS).strip()
                 
                 # Keep only alphanumeric, spaces, hyphens, underscores
-                cleaned = ''.join(c for c in cleaned if c.isalnum() or c in (' ', '-', '_'))
+                cleaned = _FILENAME_UNSAFE_RE.sub('', cleaned)
                 cleaned = cleaned.replace(' ', '_')
                 
                 # Limit length
@@ -78,30 +141,38 @@ def generate_docx_from_text(text, output_folder, template_path=None, custom_file
             else:
                 filename = f"{timestamp}_dokument.docx"
 
+        # Names are only unique to the minute, so documents of one batch can clash
+        if used_filenames is not None:
+            stem = filename[:-len('.docx')]
+            suffix = 2
+            while filename in used_filenames:
+                filename = f"{stem}_{suffix}.docx"
+                suffix += 1
+            used_filenames.add(filename)
+
         # Save source text for archival
         txt_filename = filename.replace('.docx', '.txt')
         txt_path = os.path.join(output_folder, txt_filename)
 
-        with open(txt_path, 'w', encoding='utf-8') as f:
-            f.write(text)
-
-        logger.info(f"Saved source text: {txt_filename}")
+        _write_text_async(txt_path, text)
 
-        # Generate DOCX document
-        doc = Document(template_path) if template_path and os.path.exists(template_path) else Document()
+        # Generate and save DOCX document
+        docx_path = os.path.join(output_folder, filename)
 
-        # Choose formatting mode
-        if use_bhk_format and HAS_BHK_FORMATTER:
-            logger.info("Using BHK format conversion (Markdown-aware)")
-            formatter = BHKFormatter(template_path)
-            formatter.convert_to_docx(doc, text)
+        if DOCX_BUILD_WORKERS > 0:
+            pool = _get_build_pool()
+            try:
+                data = pool.submit(_build_docx_bytes, text, template_path, use_bhk_format).result()
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM kill); start a fresh pool for the next
+                # call and build this document here
+                logger.warning("DOCX build pool broken, recreating it and building in-process")
+                _discard_build_pool(pool)
+                data = _build_docx_bytes(text, template_path, use_bhk_format)
+            with open(docx_path, 'wb') as f:
+                f.write(data)
         else:
-            logger.info("Using legacy plain text conversion")
-            _legacy_text_conversion(doc, text)
-
-        # Save DOCX file
-        docx_path = os.path.join(output_folder, filename)
-        doc.save(docx_path)
+            _build_docx(text, template_path, use_bhk_format, docx_path)
 
         logger.info(f"Generated DOCX: {filename}")
 
@@ -112,6 +183,216 @@ def generate_docx_from_text(text, output_folder, template_path=None, custom_file
         raise e
 
 
+def _first_nonempty_line(text):
+    """Return the first line of `text` that is not blank, stripped ('' if none).
+
+    That is the line holding the first non-whitespace character, so only
+    that line is sliced out instead of splitting the whole text.
+    """
+    match = _NON_SPACE_RE.search(text)
+    if not match:
+        return ''
+
+    start = text.rfind('\n', 0, match.start()) + 1
+    end = text.find('\n', match.start())
+    return text[start:end if end != -1 else len(text)].strip()
+
+
+def _build_docx(text, template_path, use_bhk_format, target):
+    """Convert text to a DOCX document and save it.
+
+    Args:
+        text: Plain or Markdown text to convert
+        template_path: Path to BHK template (optional)
+        use_bhk_format: If True, parse Markdown and apply BHK formatting
+        target: Output file path or binary file object
+    """
+    template_key = _template_key(template_path)
+    doc = _new_document(template_key)
+
+    # Choose formatting mode
+    if use_bhk_format and HAS_BHK_FORMATTER:
+        logger.info("Using BHK format conversion (Markdown-aware)")
+        formatter = BHKFormatter(template_path)
+        formatter.convert_to_docx(doc, text)
+    else:
+        logger.info("Using legacy plain text conversion")
+        _legacy_text_conversion(doc, text)
+
+    _save_docx(doc, target, static_key=template_key)
+
+
+def _build_docx_bytes(text, template_path, use_bhk_format):
+    """Build a DOCX document in memory (runs in a build worker process).
+
+    Returns:
+        The DOCX file content
+    """
+    buffer = io.BytesIO()
+    _build_docx(text, template_path, use_bhk_format, buffer)
+    return buffer.getvalue()
+
+
+def _get_build_pool():
+    """Return the document build process pool, starting it on first use.
+
+    Workers are spawned rather than forked: this process already runs
+    writer and scheduler threads whose locks a fork would copy.
+    """
+    global _build_pool
+
+    with _build_pool_lock:
+        if _build_pool is None:
+            _build_pool = ProcessPoolExecutor(
+                max_workers=DOCX_BUILD_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _build_pool
+
+
+def _discard_build_pool(pool):
+    """Drop a broken build pool so that _get_build_pool starts a new one."""
+    global _build_pool
+
+    with _build_pool_lock:
+        if _build_pool is pool:
+            _build_pool = None
+    pool.shutdown(wait=False)
+
+
+def _write_text(path, data):
+    """Write encoded source text to disk (runs on the writer pool)."""
+    try:
+        with open(path, 'wb') as f:
+            f.write(data)
+        logger.info(f"Saved source text: {os.path.basename(path)}")
+    except Exception as e:
+        logger.error(f"Error saving source text {path}: {str(e)}", exc_info=True)
+
+
+def _write_text_async(path, text):
+    """Write `text` to `path` on the writer pool without blocking the request.
+
+    Args:
+        path: Output file path
+        text: Text to write (UTF-8)
+    """
+    with _pending_lock:
+        future = _WRITE_POOL.submit(_write_text, path, text.encode('utf-8'))
+        _pending_writes[path] = future
+    future.add_done_callback(lambda done: _forget_write(path, done))
+
+
+def _forget_write(path, future):
+    """Drop a finished write unless a newer write to the same path replaced it."""
+    with _pending_lock:
+        if _pending_writes.get(path) is future:
+            del _pending_writes[path]
+
+
+def _wait_for_write(path):
+    """Block until a pending write to `path` (if any) has finished."""
+    with _pending_lock:
+        future = _pending_writes.get(path)
+    if future is not None:
+        future.result()
+
+
+def _save_docx(doc, path, static_key=None):
+    """Save a Document like Document.save, but with DOCX_COMPRESS_LEVEL.
+
+    python-docx always deflates at the zlib default level (6), which dominates
+    save time for text-heavy documents.
+
+    With a `static_key`, every member except the main document part and its
+    relationships is serialized only on the first save and reused from
+    memory afterwards; styles, settings, theme etc. of the template are
+    never modified when generating documents.
+
+    Args:
+        doc: Document object to save
+        path: Output file path or binary file object
+        static_key: Template key identifying the unchanged members (optional)
+    """
+    if not HAS_FAST_SAVE:
+        doc.save(path)
+        return
+
+    package = doc.part.package
+    parts = package.parts
+    main_part = doc.part
+    main_part.before_marshal()
+
+    static = _static_members.get(static_key) if static_key is not None else None
+    if static is None:
+        for part in parts:
+            part.before_marshal()
+        static = {
+            CONTENT_TYPES_URI.membername: _ContentTypesItem.from_parts(parts).blob,
+            PACKAGE_URI.rels_uri.membername: package.rels.xml,
+        }
+        for part in parts:
+            if part is not main_part:
+                static[part.partname.membername] = part.blob
+                if len(part.rels):
+                    static[part.partname.rels_uri.membername] = part.rels.xml
+        if static_key is not None:
+            if len(_static_members) >= _STATIC_MEMBERS_MAX:
+                _static_members.pop(next(iter(_static_members)), None)
+            _static_members[static_key] = static
+
+    if DOCX_COMPRESS_LEVEL == 0:
+        compression, compresslevel = zipfile.ZIP_STORED, None
+    else:
+        compression, compresslevel = zipfile.ZIP_DEFLATED, DOCX_COMPRESS_LEVEL
+
+    main_name = main_part.partname.membername
+    main_rels_name = main_part.partname.rels_uri.membername
+
+    with zipfile.ZipFile(path, 'w', compression=compression, compresslevel=compresslevel) as zipf:
+        for membername, blob in static.items():
+            zipf.writestr(membername, blob)
+        zipf.writestr(main_name, main_part.blob)
+        if len(main_part.rels):
+            zipf.writestr(main_rels_name, main_part.rels.xml)
+
+
+def _template_key(template_path=None):
+    """Return (template_path, mtime_ns) for a template, or (None, None) for the default.
+
+    Falls back to the python-docx default template if the path is missing.
+
+    Args:
+        template_path: Path to DOCX template (optional)
+    """
+    try:
+        mtime_ns = os.stat(template_path).st_mtime_ns if template_path else None
+    except OSError:
+        mtime_ns = None
+
+    if mtime_ns is None:
+        return None, None
+    return template_path, mtime_ns
+
+
+@functools.lru_cache(maxsize=4)
+def _load_template(template_path, mtime_ns):
+    """Parse a template once per (path, mtime); None loads the python-docx default."""
+    return Document(template_path)
+
+
+def _new_document(template_key=(None, None)):
+    """Return a fresh Document based on the template.
+
+    Unzipping and parsing the template dominates the cost of small documents,
+    so the parsed template is cached and each document is a deep copy of it.
+
+    Args:
+        template_key: (template_path, mtime_ns) as returned by _template_key
+    """
+    return copy.deepcopy(_load_template(*template_key))
+
+
 def _legacy_text_conversion(doc, text):
     """Legacy plain text conversion (backward compatibility).
     
@@ -119,45 +400,149 @@ def _legacy_text_conversion(doc, text):
         doc: Document object to populate
         text: Plain text content
     """
+    # Windows line endings: without this, blank lines would not separate
+    # paragraphs and every \r\n inside one would become two line breaks
+    if '\r' in text:
+        text = text.replace('\r\n', '\n')
+
     # Add title if available (extract from first line if it looks like a title)
-    lines = text.split('\n')
-    if lines and len(lines[0]) < 100 and not lines[0].startswith(' '):
-        doc.add_heading(lines[0], level=1)
-        content_text = '\n'.join(lines[1:])
+    first_line, _, rest = text.partition('\n')
+    if len(first_line) < 100 and not first_line.startswith(' '):
+        doc.add_heading(first_line, level=1)
+        content_text = rest
     else:
         content_text = text
 
-    # Add paragraphs (split by double newline for better formatting)
-    paragraphs = content_text.split('\n\n')
-    
     # Check if we can use the last paragraph if it's empty (common in templates)
+    # (doc.paragraphs would wrap every paragraph of the body to get the last one)
     target_style = None
-    if doc.paragraphs and not doc.paragraphs[-1].text.strip():
-        last_p = doc.paragraphs[-1]
-        target_style = last_p.style
-    else:
-        last_p = None
+    last_p = None
+    last_element = next(doc.element.body.iterchildren(qn('w:p'), reversed=True), None)
+    if last_element is not None:
+        paragraph = Paragraph(last_element, doc)
+        if not paragraph.text.strip():
+            last_p = paragraph
+            target_style = last_p.style
 
-    first_para_written = False
-    
-    for para_text in paragraphs:
-        if not para_text.strip():
-            continue
-            
-        if not first_para_written and last_p:
-            # Use the existing empty paragraph
-            last_p.add_run(para_text.strip())
-            first_para_written = True
+    # Add paragraphs (separated by blank lines for better formatting)
+    stripped = (match.group().strip() for match in _PARAGRAPH_RE.finditer(content_text))
+    texts = (para_text for para_text in stripped if para_text)
+
+    if last_p:
+        # Use the existing empty paragraph
+        first_text = next(texts, None)
+        if first_text:
+            last_p.add_run(first_text)
+
+    # Add new paragraphs, inheriting style if available
+    _append_paragraphs(doc, texts, style=target_style)
+
+
+def _append_paragraphs(doc, texts, style=None):
+    """Append one paragraph per text directly to the document body XML.
+
+    ``doc.add_paragraph`` searches the body for ``w:sectPr`` on every call,
+    which makes long documents quadratic to build. Here ``w:sectPr`` is
+    located once and every new ``w:p`` is inserted in front of it.
+
+    Args:
+        doc: Document object to populate
+        texts: Iterable of paragraph texts
+        style: Paragraph style object or name (optional)
+    """
+    body = doc.element.body
+    style_id = doc.part.get_style_id(style, WD_STYLE_TYPE.PARAGRAPH) if style is not None else None
+    sectPr = body.find(qn('w:sectPr'))
+
+    for text in texts:
+        p = OxmlElement('w:p')
+        if style_id:
+            p.style = style_id
+        p.add_r().text = text
+
+        if sectPr is not None:
+            sectPr.addprevious(p)
         else:
-            # Add new paragraph, inheriting style if available
-            doc.add_paragraph(para_text.strip(), style=target_style)
+            body.append(p)
+
+
+def _move_file(src, dst):
+    """Move a file, renaming in place when source and target share a filesystem.
+
+    Args:
+        src: Source path
+        dst: Destination path
+    """
+    try:
+        os.replace(src, dst)
+    except OSError as e:
+        # Archive folder on a different filesystem: copy and delete instead
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(src, dst)
+
+
+def schedule_archive(docx_filename, txt_filename, upload_folder, archive_folder, delay=86400):
+    """Schedule archival of a generated DOCX and its source TXT.
+
+    Args:
+        docx_filename: DOCX filename in upload_folder
+        txt_filename: TXT filename in upload_folder
+        upload_folder: Directory holding the active files
+        archive_folder: Archive root directory
+        delay: Seconds until the files are archived (default: 24 hours)
+    """
+    schedule_archives([(docx_filename, txt_filename)], upload_folder, archive_folder, delay)
+
+
+def schedule_archives(file_pairs, upload_folder, archive_folder, delay=86400):
+    """Schedule archival of several (docx_filename, txt_filename) pairs in one batch.
+
+    All pairs share one scheduler thread, so pending archivals cost a heap
+    entry each instead of a sleeping thread.
+
+    Args:
+        file_pairs: Iterable of (docx_filename, txt_filename) tuples
+        upload_folder: Directory holding the active files
+        archive_folder: Archive root directory
+        delay: Seconds until the files are archived (default: 24 hours)
+    """
+    global _archive_thread
+
+    due = time.monotonic() + delay
+    with _archive_cv:
+        for docx_filename, txt_filename in file_pairs:
+            heapq.heappush(_archive_heap, (due, docx_filename, txt_filename, upload_folder, archive_folder))
+        if _archive_thread is None:
+            _archive_thread = threading.Thread(target=_archive_scheduler, name="archive-scheduler", daemon=True)
+            _archive_thread.start()
+        _archive_cv.notify()
+
+
+def _archive_scheduler():
+    """Archive files as their retention period expires."""
+    while True:
+        with _archive_cv:
+            while not _archive_heap or _archive_heap[0][0] > time.monotonic():
+                timeout = _archive_heap[0][0] - time.monotonic() if _archive_heap else None
+                _archive_cv.wait(timeout)
+            _, docx_filename, txt_filename, upload_folder, archive_folder = heapq.heappop(_archive_heap)
+
+        _ARCHIVE_POOL.submit(_archive_files, docx_filename, txt_filename, upload_folder, archive_folder)
+
 
 def archive_files_after_delay(docx_filename, txt_filename, upload_folder, archive_folder, delay=86400):
     """
     Archive source and generated files after delay period.
+
+    Blocks the calling thread for `delay` seconds; prefer schedule_archive.
     """
     time.sleep(delay)
+    _archive_files(docx_filename, txt_filename, upload_folder, archive_folder)
+
 
+def _archive_files(docx_filename, txt_filename, upload_folder, archive_folder):
+    """Move a DOCX and its source TXT into today's archive folder."""
     try:
         # Create archive subdirectory for today
         archive_date = datetime.now().strftime("%y%m%d")
@@ -169,15 +554,16 @@ def archive_files_after_delay(docx_filename, txt_filename, upload_folder, archiv
         docx_dst = os.path.join(daily_archive, docx_filename)
 
         if os.path.exists(docx_src):
-            shutil.move(docx_src, docx_dst)
+            _move_file(docx_src, docx_dst)
             logger.info(f"Archived DOCX: {docx_filename} -> {daily_archive}")
 
         # Move TXT file
         txt_src = os.path.join(upload_folder, txt_filename)
         txt_dst = os.path.join(daily_archive, txt_filename)
+        _wait_for_write(txt_src)
 
         if os.path.exists(txt_src):
-            shutil.move(txt_src, txt_dst)
+            _move_file(txt_src, txt_dst)
             logger.info(f"Archived TXT: {txt_filename} -> {daily_archive}")
 
     except Exception as e:
@@ -5,18 +5,23 @@ Pure MCP implementation - file serving handled by Nginx
 """
 
 import os
+import asyncio
+import hashlib
 import threading
+import time
 import logging
+from concurrent.futures import Future
 from datetime import datetime
 from dotenv import load_dotenv
 from mcp.server.fastmcp import FastMCP
-from docx_logic import generate_docx_from_text, archive_files_after_delay
+from sse_starlette import EventSourceResponse
+from docx_logic import generate_docx_from_text, schedule_archive
 from starlette.requests import Request
 from starlette.responses import JSONResponse
 
 # Configure logging
 logging.basicConfig(
-    level=logging.INFO,
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger("MCP_Server")
@@ -28,33 +33,94 @@ load_dotenv()
 UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "/app/docx_files")
 ARCHIVE_FOLDER = os.getenv("ARCHIVE_FOLDER", "/app/archive")
 PUBLIC_URL = os.getenv("PUBLIC_URL", "http://mcp.eunomialegal.de")
+DOWNLOAD_URL_PREFIX = f"{PUBLIC_URL}/download/"
 TEMPLATE_PATH = os.getenv("TEMPLATE_PATH", "/app/templates/bhk-base.docx")
 
+# Seconds a health check result is reused (tool result and /health caching)
+HEALTH_CACHE_TTL = int(os.getenv("HEALTH_CACHE_TTL", "10"))
+_health_cache = (0.0, None)  # (monotonic timestamp, status message)
+_health_lock = threading.Lock()
+
+# Seconds between SSE keep-alive pings. The MCP SSE transport creates its
+# EventSourceResponse without a ping argument, so the class default applies to
+# every connection. Values <= 0 are rejected: sse-starlette before 3.5 keeps
+# pinging in a loop at interval 0 instead of disabling pings.
+SSE_PING_INTERVAL = float(os.getenv("SSE_PING_INTERVAL", "15"))
+if SSE_PING_INTERVAL <= 0:
+    logger.warning("SSE_PING_INTERVAL must be > 0, using %s", EventSourceResponse.DEFAULT_PING_INTERVAL)
+    SSE_PING_INTERVAL = EventSourceResponse.DEFAULT_PING_INTERVAL
+EventSourceResponse.DEFAULT_PING_INTERVAL = SSE_PING_INTERVAL
+
+# Recent generate_docx_document results, so a retried or repeated call with the
+# same text reuses the document (and its archival slot) instead of building a
+# new one: {key: (expires_at, message)} plus {key: Future} for calls in progress
+_RECENT_RESULTS_MAX = 1024
+_recent_results = {}
+_inflight = {}
+_dedup_lock = threading.Lock()
+_generation_tasks = set()  # strong references to running _generate_shared tasks
+
+# Tool response texts (plain text instead of JSON for better Mistral agent display)
+_SUCCESS_TEMPLATE = """✅ Dokument erfolgreich erstellt!
+
+📄 **Datei:** {docx}
+
+📥 **Download-Link:**
+{url}
+
+💡 **Hinweis:** 
+- Rechtsklick → 'Link speichern unter...' wenn der direkte Download nicht funktioniert
+- Ihr Browser könnte die Datei als 'ungewöhnlich' markieren - dies ist normal für neue Services
+- Klicken Sie auf 'Trotzdem herunterladen' - die Datei ist sicher!
+
+⏱️ **Link gültig bis:** {expiry} Uhr (24 Stunden)
+"""
+_ERROR_TEMPLATE = "❌ Fehler bei der Dokumentgenerierung\n\nDetails: {details}\n\nBitte versuchen Sie es erneut oder kontaktieren Sie den Support."
+_HEALTHY_MESSAGE = "✅ Service ist betriebsbereit\n\n📦 Version: 2.0.0\n💾 Speicher: Verfügbar\n🔒 HTTPS: Aktiv"
+_UNHEALTHY_MESSAGE = "❌ Service-Fehler\n\nSpeicher nicht verfügbar. Bitte kontaktieren Sie den Administrator."
+
 # Ensure directories exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(ARCHIVE_FOLDER, exist_ok=True)
 
+class CachedToolsFastMCP(FastMCP):
+    """FastMCP that answers tools/list from a cached result.
+
+    The tool set only changes through add_tool/remove_tool (at import time
+    here), while MCP clients re-fetch the list on every reconnect.
+    """
+
+    _tools_list = None
+
+    async def list_tools(self):
+        if self._tools_list is None:
+            self._tools_list = await super().list_tools()
+        return self._tools_list
+
+    def add_tool(self, *args, **kwargs) -> None:
+        self._tools_list = None
+        super().add_tool(*args, **kwargs)
+
+    def remove_tool(self, name: str) -> None:
+        self._tools_list = None
+        super().remove_tool(name)
+
+
 # Initialize MCP Server
-mcp = FastMCP(
+mcp = CachedToolsFastMCP(
     name="DOCXGenerator",
     host="0.0.0.0",
     port=7860
 )
 
-print(f"""
-{'='*60}
-MCP Server for DOCX Generation (Integrated)
-{'='*60}
-Protocol: Model Context Protocol with SSE Transport
-Upload Folder: {UPLOAD_FOLDER}
-Public URL: {PUBLIC_URL}
-Note: File downloads served by Nginx at {PUBLIC_URL}/download/
-{'='*60}
-""")
+logger.info(
+    "MCP Server for DOCX Generation (SSE transport) - upload folder: %s, downloads served by Nginx at %s",
+    UPLOAD_FOLDER, DOWNLOAD_URL_PREFIX
+)
 
 
 @mcp.tool()
-def generate_docx_document(text: str) -> str:
+async def generate_docx_document(text: str) -> str:
     """
     Generiert ein DOCX-Dokument aus dem bereinigten Diktat-Text und gibt einen Download-Link zurück.
 
@@ -68,16 +134,75 @@ def generate_docx_document(text: str) -> str:
     Returns:
         str: Statusmeldung mit Download-Link
     """
-    import json
-    
     filename = "diktat_vergaberecht"
-    
-    print(f"📤 MCP Tool called: generate_docx_document")
-    print(f"📄 Filename: {filename}.docx")
-    print(f"📝 Text length: {len(text)} characters")
+    key = hashlib.blake2b(text.encode('utf-8'), digest_size=16, key=filename.encode('utf-8')).digest()
+
+    with _dedup_lock:
+        cached = _recent_results.get(key)
+        if cached is not None and cached[0] > time.time():
+            logger.info("generate_docx_document: returning recent result for identical text")
+            return cached[1]
+
+        future = _inflight.get(key)
+        is_owner = future is None
+        if is_owner:
+            future = _inflight[key] = Future()
+
+    if is_owner:
+        # Output names are only unique to the minute; a token from the text hash
+        # keeps another text from overwriting a document whose link is cached
+        doc_name = f"{filename}_{key.hex()[:8]}"
+        task = asyncio.create_task(_generate_shared(key, future, text, doc_name))
+        _generation_tasks.add(task)
+        task.add_done_callback(_generation_tasks.discard)
+    else:
+        logger.info("generate_docx_document: waiting for identical call in progress")
+
+    # Shielded, so a caller whose client disconnects does not cancel the
+    # shared result for the other callers
+    return await asyncio.shield(asyncio.wrap_future(future))
+
+
+async def _generate_shared(key: bytes, future: Future, text: str, filename: str) -> None:
+    """Generate a document for all callers waiting on `future`.
+
+    Runs as its own task, so the result is stored and handed out even if
+    the call that started it is cancelled.
+    """
+    # FastMCP runs tools on its event loop; generate in a worker thread so
+    # other tool calls and SSE connections are served meanwhile
+    try:
+        message, expires_at = await asyncio.to_thread(_generate_document, text, filename)
+    except asyncio.CancelledError:
+        with _dedup_lock:
+            del _inflight[key]
+        future.cancel()
+        raise
+    except Exception as e:
+        with _dedup_lock:
+            del _inflight[key]
+        if not future.done():
+            future.set_exception(e)
+        return
+
+    with _dedup_lock:
+        del _inflight[key]
+        if expires_at is not None:
+            _remember_result(key, expires_at, message)
+    if not future.done():
+        future.set_result(message)
+
+
+def _generate_document(text: str, filename: str):
+    """Generate the document and build the tool response.
+
+    Returns:
+        Tuple of (message, expires_at timestamp), expires_at None on failure
+    """
+    logger.info("generate_docx_document called: %s.docx, %d characters", filename, len(text))
 
     try:
-        # Generate DOCX (Synchronous call is fine in FastMCP threadpool)
+        # Generate DOCX (runs in a worker thread, see generate_docx_document)
         docx_filename, txt_filename = generate_docx_from_text(
             text, 
             UPLOAD_FOLDER, 
@@ -86,46 +211,40 @@ def generate_docx_document(text: str) -> str:
         )
         
         # Generate download URL
-        download_url = f"{PUBLIC_URL}/download/{docx_filename}"
+        download_url = DOWNLOAD_URL_PREFIX + docx_filename
         
         # Calculate expiry time (24 hours)
-        expires_at = datetime.now().timestamp() + 86400
-        
-        # Schedule file deletion and archival
-        threading.Thread(
-            target=archive_files_after_delay,
-            args=(docx_filename, txt_filename, UPLOAD_FOLDER, ARCHIVE_FOLDER, 86400),
-            daemon=True
-        ).start()
+        expires_at = time.time() + 86400
         
-        
-        print(f"✅ DOCX generated successfully: {download_url}")
-
-        # Return plain text message instead of JSON for better Mistral agent display
-        message = f"""✅ Dokument erfolgreich erstellt!
-
-📄 **Datei:** {docx_filename}
+        # Schedule file deletion and archival (one shared scheduler thread)
+        schedule_archive(docx_filename, txt_filename, UPLOAD_FOLDER, ARCHIVE_FOLDER, 86400)
 
-📥 **Download-Link:**
-{download_url}
+        logger.info("DOCX generated successfully: %s", download_url)
 
-💡 **Hinweis:** 
-- Rechtsklick → 'Link speichern unter...' wenn der direkte Download nicht funktioniert
-- Ihr Browser könnte die Datei als 'ungewöhnlich' markieren - dies ist normal für neue Services
-- Klicken Sie auf 'Trotzdem herunterladen' - die Datei ist sicher!
+        # Return plain text message instead of JSON for better Mistral agent display
+        message = _SUCCESS_TEMPLATE.format(
+            docx=docx_filename,
+            url=download_url,
+            expiry=time.strftime('%d.%m.%Y %H:%M', time.localtime(expires_at))
+        )
+        return message, expires_at
 
-⏱️ **Link gültig bis:** {datetime.fromtimestamp(expires_at).strftime('%d.%m.%Y %H:%M')} Uhr (24 Stunden)
-"""
-        
-        return message
+    except Exception as e:
+        logger.error("Fehler bei der Dokumentgenerierung: %s", e, exc_info=True)
 
+        return _ERROR_TEMPLATE.format(details=e), None
 
-    except Exception as e:
-        error_msg = f"Fehler bei der Dokumentgenerierung: {str(e)}"
-        print(f"❌ {error_msg}")
-        logger.error(error_msg, exc_info=True)
 
-        return f"❌ Fehler bei der Dokumentgenerierung\n\nDetails: {str(e)}\n\nBitte versuchen Sie es erneut oder kontaktieren Sie den Support."
+def _remember_result(key: bytes, expires_at: float, message: str) -> None:
+    """Store a successful result until its download link expires (caller holds _dedup_lock)."""
+    if len(_recent_results) >= _RECENT_RESULTS_MAX:
+        now = time.time()
+        for old_key in [k for k, (expiry, _) in _recent_results.items() if expiry <= now]:
+            del _recent_results[old_key]
+        if len(_recent_results) >= _RECENT_RESULTS_MAX:
+            # Oldest entry first (dicts keep insertion order)
+            del _recent_results[next(iter(_recent_results))]
+    _recent_results[key] = (expires_at, message)
 
 
 @mcp.tool()
@@ -136,13 +255,25 @@ def check_service_health() -> str:
     Returns:
         str: Health-Status als Text
     """
-    # Check if upload folder is writable
-    is_writable = os.access(UPLOAD_FOLDER, os.W_OK)
-    
-    if is_writable:
-        return "✅ Service ist betriebsbereit\n\n📦 Version: 2.0.0\n💾 Speicher: Verfügbar\n🔒 HTTPS: Aktiv"
-    else:
-        return "❌ Service-Fehler\n\nSpeicher nicht verfügbar. Bitte kontaktieren Sie den Administrator."
+    global _health_cache
+
+    checked_at, message = _health_cache
+    if message is not None and time.monotonic() - checked_at < HEALTH_CACHE_TTL:
+        return message
+
+    with _health_lock:
+        # Another caller may have refreshed the result while we waited
+        checked_at, message = _health_cache
+        if message is not None and time.monotonic() - checked_at < HEALTH_CACHE_TTL:
+            return message
+
+        # Check if upload folder is writable
+        is_writable = os.access(UPLOAD_FOLDER, os.W_OK)
+
+        message = _HEALTHY_MESSAGE if is_writable else _UNHEALTHY_MESSAGE
+
+        _health_cache = (time.monotonic(), message)
+        return message
 
 
 @mcp.custom_route("/health", methods=["GET"])
@@ -150,14 +281,14 @@ async def health_check(request: Request) -> JSONResponse:
     """
     Health check endpoint for Docker
     """
-    return JSONResponse({"status": "healthy", "timestamp": datetime.now().isoformat()})
+    return JSONResponse(
+        {"status": "healthy", "timestamp": datetime.now().isoformat()},
+        headers={"Cache-Control": f"public, max-age={HEALTH_CACHE_TTL}"}
+    )
 
 
 if __name__ == "__main__":
-    print("🚀 Starting Integrated MCP Server...")
-    print("📡 Listening on: 0.0.0.0:7860")
-    print("🔗 MCP Endpoint: http://0.0.0.0:7860")
-    print("🔗 SSE Endpoint: http://0.0.0.0:7860/sse")
+    logger.info("Starting MCP server on 0.0.0.0:7860 (SSE endpoint: /sse)")
     
     # Run with SSE transport
     mcp.run(transport="sse")